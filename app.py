@@ -1,10 +1,16 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request
 import geopandas as gpd
+import shapely
 from shapely.geometry import Point
-import folium
-from geopy.geocoders import Nominatim
+from shapely.strtree import STRtree
+import numpy as np
+import pyproj
+import orjson
 import os
-import json
+import re
+import functools
+import gzip
+import hashlib
 from dotenv import load_dotenv
 import requests
 
@@ -15,6 +21,28 @@ app = Flask(__name__)
 
 # Global variable to store loaded data
 metro_data = None
+# Spatial index over metro_data plus column arrays aligned to its positions
+# (metro_geoms is simplified for distance work; metro_geoms_exact keeps the
+# original boundaries for containment, so state/inside answers don't change)
+metro_tree = None
+metro_geoms = None
+metro_geoms_exact = None
+metro_names = None
+metro_cbsa = None
+metro_states = None
+# Bounding boxes as separate arrays
+metro_minx = metro_miny = metro_maxx = metro_maxy = None
+# WGS84 copy of metro_data for display and edge coordinates
+metro_data_wgs84 = None
+metro_geoms_wgs84 = None
+# Serialized /metros.geojson response, built once since the data never changes
+metros_geojson_bytes = None
+metros_geojson_gzip = None
+metros_geojson_etag = None
+
+# Cached WGS84 <-> Web Mercator transforms for point coordinates (lon, lat order)
+to_web_mercator = pyproj.Transformer.from_crs('EPSG:4326', 'EPSG:3857', always_xy=True).transform
+to_wgs84 = pyproj.Transformer.from_crs('EPSG:3857', 'EPSG:4326', always_xy=True).transform
 
 # States where we don't lend
 EXCLUDED_STATES = {
@@ -22,34 +50,54 @@ EXCLUDED_STATES = {
     'Hawaii', 'Alaska', 'Florida', 'New York', 'New Jersey', 'North Dakota', 'South Dakota'
 }
 
+def ojsonify(obj, status=200):
+    """JSON response serialized with orjson (handles NumPy values directly)"""
+    return Response(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+def get_state_from_metro_name(metro_name):
+    """Extract state from metro name (e.g., "Miami, FL" -> "FL")"""
+    # State abbreviations are usually after comma or hyphen
+    parts = metro_name.replace('-', ',').split(',')
+    for part in parts:
+        part = part.strip()
+        # Check if it's a state abbreviation (2 letters) or full name
+        if len(part) == 2 and part.isupper():
+            return part
+        # Check against full state names
+        for state in EXCLUDED_STATES:
+            if state in part:
+                return state
+    return None
+
+def bbox_candidates(px, py):
+    """Positions of metros whose bounding box contains a projected point"""
+    return np.flatnonzero(
+        (metro_minx <= px) & (px <= metro_maxx) & (metro_miny <= py) & (py <= metro_maxy)
+    )
+
+def metros_containing(px, py):
+    """Positions (in file order) of metros whose exact boundary contains a projected point"""
+    candidates = bbox_candidates(px, py)
+    return candidates[shapely.contains_xy(metro_geoms_exact[candidates], px, py)]
+
 def get_state_from_coords(lat, lon):
     """Get state from coordinates - use metro name to infer state"""
     # Quick method: check if coordinates fall within any metro area
-    # and extract state from metro name (they all include state abbreviations)
+    # and look up the state parsed from its name at load time
     try:
         if metro_data is None:
             return None
             
-        point = gpd.GeoSeries([Point(lon, lat)], crs='EPSG:4326')
-        point_proj = point.to_crs('EPSG:3857')
+        px, py = to_web_mercator(lon, lat)
         
-        # Check if point is inside any metro
-        for idx, row in metro_data.iterrows():
-            if row.geometry.contains(point_proj.iloc[0]):
-                # Extract state from metro name (e.g., "Miami, FL" -> "FL")
-                metro_name = row['NAME']
-                # State abbreviations are usually after comma or hyphen
-                parts = metro_name.replace('-', ',').split(',')
-                for part in parts:
-                    part = part.strip()
-                    # Check if it's a state abbreviation (2 letters) or full name
-                    if len(part) == 2 and part.isupper():
-                        return part
-                    # Check against full state names
-                    for state in EXCLUDED_STATES:
-                        if state in part:
-                            return state
-                break
+        # Check if point is inside any metro (bounding boxes, then exact test)
+        inside = metros_containing(px, py)
+        if len(inside) > 0:
+            return metro_states[inside[0]]
     except Exception as e:
         print(f"State lookup error: {e}")
     return None
@@ -68,7 +116,10 @@ def ensure_metro_data_loaded():
 
 def load_metro_data():
     """Load Census MSA boundaries on startup"""
-    global metro_data
+    global metro_data, metro_tree, metro_geoms, metro_geoms_exact, metro_names, metro_cbsa, metro_states
+    global metro_minx, metro_miny, metro_maxx, metro_maxy
+    global metro_data_wgs84, metro_geoms_wgs84
+    global metros_geojson_bytes, metros_geojson_gzip, metros_geojson_etag
     # Get the directory where this script is located
     base_dir = os.path.dirname(os.path.abspath(__file__))
     shapefile_path = os.path.join(base_dir, 'data', 'tl_2023_us_cbsa.shp')
@@ -91,19 +142,20 @@ def load_metro_data():
         # Filter to only include target metros
         # Match by checking if the Census NAME contains key parts of our target names
         if target_names:
-            # Create a simplified matching - extract city/main area names
-            def matches_target(census_name):
-                census_name_clean = census_name.lower()
-                for target in target_names:
-                    # Extract the main part before comma
-                    target_main = target.split(',')[0].lower().strip()
-                    # Remove MSA suffix
-                    target_main = target_main.replace(' msa', '').strip()
-                    if target_main in census_name_clean:
-                        return True
-                return False
+            # Create a simplified matching - extract city/main area names once
+            target_mains = set()
+            for target in target_names:
+                # Extract the main part before comma
+                target_main = target.split(',')[0].lower().strip()
+                # Remove MSA suffix
+                target_main = target_main.replace(' msa', '').strip()
+                target_mains.add(target_main)
+            
+            # Single compiled alternation so each Census name is scanned once
+            target_pattern = re.compile('|'.join(re.escape(t) for t in sorted(target_mains)))
+            matches_target = all_metro_data['NAME'].str.lower().str.contains(target_pattern)
             
-            metro_data = all_metro_data[all_metro_data['NAME'].apply(matches_target)].copy()
+            metro_data = all_metro_data[matches_target].copy()
             print(f"Filtered to {len(metro_data)} metropolitan areas matching your list")
         else:
             metro_data = all_metro_data
@@ -111,6 +163,63 @@ def load_metro_data():
         
         # Convert to appropriate CRS for distance calculations (meters)
         metro_data = metro_data.to_crs('EPSG:3857')
+        
+        # Containment decides lending eligibility, so keep the exact boundaries
+        # for it; simplification doesn't preserve borders shared between metros
+        metro_geoms_exact = np.asarray(metro_data.geometry)
+        
+        # Census boundaries carry far more detail than a miles-scale distance
+        # needs; a 50 m tolerance cuts vertex counts ~12x for distance queries
+        metro_data['geometry'] = metro_data.geometry.simplify(50.0, preserve_topology=True)
+        
+        # Cache column arrays and the spatial index once; lookups below are
+        # positions into metro_data
+        metro_geoms = np.asarray(metro_data.geometry)
+        metro_tree = STRtree(metro_geoms)
+        metro_names = np.asarray(metro_data['NAME'])
+        metro_cbsa = np.asarray(metro_data['CBSAFP'])
+        # Parse each metro's state once so lookups don't touch the name strings
+        metro_states = np.array([get_state_from_metro_name(name) for name in metro_names], dtype=object)
+        
+        # Bounding boxes let containment checks prune metros without touching GEOS
+        bounds = shapely.bounds(metro_geoms_exact)
+        metro_minx, metro_miny, metro_maxx, metro_maxy = (
+            np.ascontiguousarray(bounds[:, i]) for i in range(4)
+        )
+        
+        # Reproject back to WGS84 once rather than on every request
+        metro_data_wgs84 = metro_data.to_crs('EPSG:4326')
+        metro_geoms_wgs84 = np.asarray(metro_data_wgs84.geometry)
+        
+        # Metro centers as points for the map, serialized once with orjson.
+        # Centroids are taken in Web Mercator (the map's projection) and only
+        # those N points are transformed, not every polygon vertex
+        centroids = shapely.centroid(metro_geoms)
+        xs, ys = to_wgs84(shapely.get_x(centroids), shapely.get_y(centroids))
+        metros_geojson_bytes = orjson.dumps({
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": [x, y]
+                    },
+                    "properties": {
+                        "name": name
+                    }
+                }
+                for name, x, y in zip(metro_names, xs.tolist(), ys.tolist())
+            ]
+        })
+        metros_geojson_gzip = gzip.compress(metros_geojson_bytes, compresslevel=9)
+        metros_geojson_etag = hashlib.md5(metros_geojson_bytes).hexdigest()
+        
+        # Requests only read this state; freeze the arrays so an accidental
+        # element assignment fails loudly instead of racing between threads
+        for arr in (metro_geoms, metro_geoms_exact, metro_names, metro_cbsa, metro_states,
+                    metro_geoms_wgs84, metro_minx, metro_miny, metro_maxx, metro_maxy):
+            arr.flags.writeable = False
     else:
         print(f"Warning: Shapefile not found at {shapefile_path}")
 
@@ -147,341 +256,116 @@ def home():
     </html>
     '''
 
-@app.route('/geocode')
-def geocode():
-    """Geocode an address using Google Maps or Nominatim"""
-    address = request.args.get('address')
-    if not address:
-        return jsonify({"error": "Address parameter required"}), 400
+# Reused HTTP connection pool for Google Maps geocoding requests
+geocode_session = requests.Session()
+
+class GeocodeFallback(Exception):
+    """Carries a Nominatim result reached because Google Maps failed.
     
+    Raised out of the cached lookup so lru_cache doesn't store it; the next
+    request for the same address tries Google Maps again.
+    """
+    def __init__(self, result):
+        super().__init__("Google Maps geocoding failed; used Nominatim")
+        self.result = result
+
+def geocode_nominatim(query):
+    """Geocode with Nominatim (free); returns (lat, lon, display_name, source) or None"""
+    # geopy is only needed here, so import it on first use rather than at startup
+    from geopy.geocoders import Nominatim
+    geolocator = Nominatim(user_agent="metro_proximity_checker")
+    location = geolocator.geocode(query)
+    if location:
+        return (location.latitude, location.longitude, location.address, "Nominatim")
+    return None
+
+@functools.lru_cache(maxsize=10000)
+def geocode_address(query):
+    """Geocode a normalized address; results are cached per query.
+    
+    Returns (lat, lon, display_name, source), or None if the address is not found.
+    Raises GeocodeFallback (not cached) when Google Maps errored and Nominatim
+    answered instead.
+    """
     # Try Google Maps first if API key is available
     google_api_key = os.getenv('GOOGLE_MAPS_API_KEY')
     if google_api_key:
         try:
-            url = f"https://maps.googleapis.com/maps/api/geocode/json?address={requests.utils.quote(address)}&key={google_api_key}"
-            response = requests.get(url, timeout=5)
+            url = f"https://maps.googleapis.com/maps/api/geocode/json?address={requests.utils.quote(query)}&key={google_api_key}"
+            response = geocode_session.get(url, timeout=5)
             data = response.json()
+            status = data.get('status')
             
-            if data.get('status') == 'OK' and data.get('results'):
+            if status == 'OK' and data.get('results'):
                 location = data['results'][0]['geometry']['location']
-                return jsonify({
-                    "lat": location['lat'],
-                    "lon": location['lng'],
-                    "display_name": data['results'][0]['formatted_address'],
-                    "source": "Google Maps"
-                })
+                return (location['lat'], location['lng'],
+                        data['results'][0]['formatted_address'], "Google Maps")
+            google_healthy = status in ('OK', 'ZERO_RESULTS')
+            if not google_healthy:
+                print(f"Google Maps geocoding status: {status}")
         except Exception as e:
             print(f"Google Maps geocoding error: {e}")
-            # Fall through to Nominatim
+            google_healthy = False
+        
+        # Fall through to Nominatim; only cache it if Google simply had no match
+        if not google_healthy:
+            raise GeocodeFallback(geocode_nominatim(query))
     
-    # Fallback to Nominatim (free)
+    # Nominatim errors propagate so they aren't cached
+    return geocode_nominatim(query)
+
+@app.route('/geocode')
+def geocode():
+    """Geocode an address using Google Maps or Nominatim"""
+    address = request.args.get('address')
+    if not address:
+        return ojsonify({"error": "Address parameter required"}, 400)
+    
+    # Normalize so equivalent queries share a cache entry
+    query = re.sub(r'\s+', ' ', address.strip().lower())
     try:
-        geolocator = Nominatim(user_agent="metro_proximity_checker")
-        location = geolocator.geocode(address)
-        if location:
-            return jsonify({
-                "lat": location.latitude,
-                "lon": location.longitude,
-                "display_name": location.address,
-                "source": "Nominatim"
-            })
-        else:
-            return jsonify({"error": "Address not found"}), 404
+        result = geocode_address(query)
+    except GeocodeFallback as fallback:
+        result = fallback.result
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return ojsonify({"error": str(e)}, 500)
+    
+    if result is None:
+        return ojsonify({"error": "Address not found"}, 404)
+    lat, lon, display_name, source = result
+    return ojsonify({
+        "lat": lat,
+        "lon": lon,
+        "display_name": display_name,
+        "source": source
+    })
 
 @app.route('/metros.geojson')
 def metros_geojson():
     """Return metro centers as points for lightweight loading"""
     ensure_metro_data_loaded()
     if metro_data is None:
-        return jsonify({"error": "Metro data not loaded"}), 500
+        return ojsonify({"error": "Metro data not loaded"}, 500)
     
-    # Convert to WGS84 and get centroids as simple list
-    metro_display = metro_data.to_crs('EPSG:4326')
-    features = []
-    for idx, row in metro_display.iterrows():
-        centroid = row.geometry.centroid
-        features.append({
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [centroid.x, centroid.y]
-            },
-            "properties": {
-                "name": row['NAME']
-            }
-        })
-    
-    return jsonify({
-        "type": "FeatureCollection",
-        "features": features
-    })
+    # Send the pre-compressed body when the client accepts it (q > 0;
+    # "gzip;q=0" is an explicit refusal)
+    use_gzip = request.accept_encodings['gzip'] > 0
+    response = Response(
+        metros_geojson_gzip if use_gzip else metros_geojson_bytes,
+        mimetype='application/json',
+        headers={'Cache-Control': 'public, max-age=86400', 'Vary': 'Accept-Encoding'}
+    )
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    # Each encoding gets its own ETag; matching If-None-Match returns 304
+    response.set_etag(metros_geojson_etag + ('-gzip' if use_gzip else ''))
+    return response.make_conditional(request)
 
 @app.route('/map')
 def map_view():
     """Interactive map visualization"""
-    # Don't pre-load metros - let JavaScript load them asynchronously
-    m = folium.Map(location=[39.8283, -98.5795], zoom_start=4, tiles='OpenStreetMap')
-    
-    # Add search functionality
-    html_template = '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Metro Coverage Map</title>
-        <style>
-            body { margin: 0; padding: 0; font-family: Arial, sans-serif; }
-            #map { width: 100%; height: 100vh; }
-            .search-box {
-                position: absolute;
-                top: 10px;
-                left: 50px;
-                z-index: 1000;
-                background: white;
-                padding: 15px;
-                border-radius: 5px;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.3);
-            }
-            .search-box input {
-                width: 300px;
-                padding: 10px;
-                border: 1px solid #ddd;
-                border-radius: 3px;
-                font-size: 14px;
-            }
-            .search-box button {
-                padding: 10px 20px;
-                background: #0066cc;
-                color: white;
-                border: none;
-                border-radius: 3px;
-                cursor: pointer;
-                font-size: 14px;
-            }
-            .search-box button:hover { background: #0052a3; }
-            #result {
-                margin-top: 10px;
-                padding: 10px;
-                background: #f0f8ff;
-                border-radius: 3px;
-                display: none;
-            }
-            .info-box {
-                position: absolute;
-                bottom: 20px;
-                left: 50px;
-                z-index: 1000;
-                background: white;
-                padding: 15px;
-                border-radius: 5px;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.3);
-                max-width: 300px;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="search-box">
-            <h3 style="margin-top:0">Search Address</h3>
-            <input type="text" id="addressInput" placeholder="Enter full address, city, or zip code..." onkeypress="if(event.key===\'Enter\')searchAddress()">
-            <button onclick="searchAddress()">Search</button>
-            <div id="result"></div>
-        </div>
-        
-        <div class="info-box">
-            <strong>Metro Coverage Map</strong><br>
-            <small>Blue circles = 50-mile radius from metro centers<br>
-            <strong>Powered by Google Maps</strong><br>
-            Search by:<br>
-            • Full address: "123 Main St, Phoenix, AZ"<br>
-            • City, State: "Phoenix, AZ"<br>
-            • Zip code: "85718"</small>
-        </div>
-        
-        ''' + m.get_root().render() + '''
-        
-        <script>
-            let marker = null;
-            let circle = null;
-            let line = null;
-            let metroLayer = null;
-            
-            // Load metros from GeoJSON endpoint after map loads
-            window.addEventListener('DOMContentLoaded', async () => {
-                const theMap = getMap();
-                if (theMap) {
-                    try {
-                        const response = await fetch('/metros.geojson');
-                        const geojsonData = await response.json();
-                        
-                        metroLayer = L.geoJSON(geojsonData, {
-                            pointToLayer: (feature, latlng) => {
-                                return L.circle(latlng, {
-                                    radius: 50 * 1609.34, // 50 miles in meters
-                                    fillColor: '#3388ff',
-                                    color: '#0066cc',
-                                    weight: 2,
-                                    fillOpacity: 0.15,
-                                    opacity: 0.5
-                                });
-                            },
-                            onEachFeature: (feature, layer) => {
-                                if (feature.properties && feature.properties.name) {
-                                    layer.bindTooltip(feature.properties.name);
-                                }
-                            }
-                        }).addTo(theMap);
-                    } catch (error) {
-                        console.error('Failed to load metro boundaries:', error);
-                    }
-                }
-            });
-            
-            // Get the map object - Folium creates it in the global scope
-            function getMap() {
-                // Find the map object in the global scope
-                for (let key in window) {
-                    if (window[key] && typeof window[key] === 'object' && window[key]._container) {
-                        return window[key];
-                    }
-                }
-                return null;
-            }
-            
-            async function searchAddress() {
-                const address = document.getElementById('addressInput').value;
-                const resultDiv = document.getElementById('result');
-                
-                if (!address) {
-                    alert('Please enter an address');
-                    return;
-                }
-                
-                const theMap = getMap();
-                if (!theMap) {
-                    alert('Map not ready yet, please wait a moment and try again');
-                    return;
-                }
-                
-                resultDiv.style.display = 'block';
-                resultDiv.innerHTML = 'Searching...';
-                
-                try {
-                    // Use server-side geocoding (automatically uses Google Maps if API key is configured)
-                    const geoResponse = await fetch(`/geocode?address=${encodeURIComponent(address)}`);
-                    const geoData = await geoResponse.json();
-                    
-                    if (geoData.error) {
-                        resultDiv.innerHTML = `<span style="color: red;">${geoData.error}</span>`;
-                        return;
-                    }
-                    
-                    const lat = geoData.lat;
-                    const lon = geoData.lon;
-                    const displayName = geoData.display_name;
-                    
-                    // Check proximity via API
-                    const apiResponse = await fetch(`/check-proximity?lat=${lat}&lon=${lon}&max_distance=50`);
-                    const apiData = await apiResponse.json();
-                    
-                    // Remove old marker, circle, and line if they exist
-                    if (marker) {
-                        theMap.removeLayer(marker);
-                    }
-                    if (circle) {
-                        theMap.removeLayer(circle);
-                    }
-                    if (line) {
-                        theMap.removeLayer(line);
-                    }
-                    
-                    // Add marker to map
-                    marker = L.marker([lat, lon]).addTo(theMap);
-                    marker.bindPopup(`<b>${displayName}</b><br>${apiData.within_range ? '✓ Within range' : '✗ Outside range'}`).openPopup();
-                    
-                    // Add 50-mile radius circle
-                    circle = L.circle([lat, lon], {
-                        radius: 50 * 1609.34, // 50 miles in meters
-                        color: apiData.within_range ? 'green' : 'red',
-                        fillColor: apiData.within_range ? '#90EE90' : '#FFB6C1',
-                        fillOpacity: 0.2,
-                        weight: 2
-                    }).addTo(theMap);
-                    
-                    // Draw line to nearest metro edge if not inside
-                    if (!apiData.excluded && !apiData.is_inside_metro && apiData.nearest_metro.edge_coords) {
-                        const edgeCoords = apiData.nearest_metro.edge_coords;
-                        line = L.polyline(
-                            [[lat, lon], edgeCoords],
-                            {
-                                color: apiData.within_range ? 'blue' : 'red',
-                                weight: 3,
-                                opacity: 0.7,
-                                dashArray: '10, 10'
-                            }
-                        ).addTo(theMap);
-                        
-                        // Add a small marker at the metro edge
-                        L.circleMarker(edgeCoords, {
-                            radius: 6,
-                            fillColor: apiData.within_range ? 'blue' : 'red',
-                            color: '#fff',
-                            weight: 2,
-                            opacity: 1,
-                            fillOpacity: 0.8
-                        }).addTo(theMap).bindPopup(`Nearest point on ${apiData.nearest_metro.name} boundary`);
-                    }
-                    
-                    // Zoom to location
-                    theMap.setView([lat, lon], 8);
-                    
-                    // Display result
-                    if (apiData.excluded) {
-                        resultDiv.innerHTML = `
-                            <strong style="color: #ff6600;">⛔ Excluded State</strong><br>
-                            ${apiData.message}<br>
-                            <small>We do not lend in: HI, AK, FL, NY, NJ, ND, SD</small>
-                        `;
-                        // Update marker color to orange
-                        marker.remove();
-                        marker = L.marker([lat, lon], {
-                            icon: L.icon({
-                                iconUrl: 'https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-2x-orange.png',
-                                shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/0.7.7/images/marker-shadow.png',
-                                iconSize: [25, 41],
-                                iconAnchor: [12, 41],
-                                popupAnchor: [1, -34],
-                                shadowSize: [41, 41]
-                            })
-                        }).addTo(theMap);
-                        marker.bindPopup(`<b>${displayName}</b><br>⛔ Excluded State: ${apiData.excluded_state}`).openPopup();
-                        // Make circle orange
-                        circle.setStyle({color: 'orange', fillColor: '#FFA500'});
-                    } else if (apiData.within_range) {
-                        resultDiv.innerHTML = `
-                            <strong style="color: green;">✓ Within Range</strong><br>
-                            ${apiData.is_inside_metro ? 'Inside' : 'Near'}: ${apiData.nearest_metro.name}<br>
-                            Distance: ${apiData.nearest_metro.distance_to_edge_miles} miles to edge
-                        `;
-                    } else {
-                        resultDiv.innerHTML = `
-                            <strong style="color: red;">✗ Outside Range</strong><br>
-                            Nearest: ${apiData.nearest_metro.name}<br>
-                            Distance: ${apiData.nearest_metro.distance_to_edge_miles} miles away
-                        `;
-                    }
-                } catch (error) {
-                    resultDiv.innerHTML = `<span style="color: red;">Error: ${error.message}</span>`;
-                }
-            }
-        </script>
-    </body>
-    </html>
-    '''
-    
-    return render_template_string(html_template)
+    # Static page - metros are loaded asynchronously from /metros.geojson
+    return app.send_static_file('map.html')
 
 @app.route('/check-proximity', methods=['GET'])
 def check_proximity():
@@ -503,9 +387,9 @@ def check_proximity():
         max_distance_meters = max_distance_miles * 1609.34
         
         if metro_data is None:
-            return jsonify({
+            return ojsonify({
                 "error": "Metro data not loaded"
-            }), 500
+            }, 500)
         
         # Check if location is in excluded state
         try:
@@ -513,7 +397,7 @@ def check_proximity():
             print(f"State check for ({lat}, {lon}): {state}")
             if state and is_excluded_state(state):
                 print(f"Location is in excluded state: {state}")
-                return jsonify({
+                return ojsonify({
                     "excluded": True,
                     "excluded_state": state,
                     "within_range": False,
@@ -523,86 +407,98 @@ def check_proximity():
             print(f"Error checking state: {e}")
             # Continue with metro check even if state check fails
         
-        # Create point from coordinates (WGS84)
-        point = gpd.GeoSeries([Point(lon, lat)], crs='EPSG:4326')
-        # Convert to same CRS as metro data
-        point = point.to_crs('EPSG:3857')
-        
-        # Make a copy to avoid modifying global data
-        metro_working = metro_data.copy()
-        
-        # Calculate distance to each metro area boundary
-        metro_working['distance'] = metro_working.geometry.distance(point.iloc[0])
+        # Convert coordinates to same CRS as metro data
+        px, py = to_web_mercator(lon, lat)
+        point = Point(px, py)
         
-        # Get the absolute nearest metro (regardless of distance)
-        nearest_overall = metro_working.loc[metro_working['distance'].idxmin()]
-        nearest_distance_miles = nearest_overall['distance'] / 1609.34
-        is_inside_nearest = nearest_overall.geometry.contains(point.iloc[0])
+        # Metros containing the point, tested against the exact boundaries
+        # (the simplified ones used for distances can overlap or leave gaps)
+        containing = metros_containing(px, py)
+        is_inside_nearest = len(containing) > 0
         
-        # Get closest point on metro boundary for line drawing
-        nearest_geom_wgs84 = metro_data.to_crs('EPSG:4326').loc[nearest_overall.name].geometry
-        from shapely.ops import nearest_points
-        point_wgs84 = Point(lon, lat)
-        _, closest_point = nearest_points(point_wgs84, nearest_geom_wgs84)
-        nearest_edge_coords = [closest_point.y, closest_point.x]  # [lat, lon]
+        if is_inside_nearest:
+            # Inside a metro: it is the nearest one, at distance 0
+            nearest_pos = containing[0]
+            nearest_distance_miles = 0.0
+            nearest_edge_coords = [lat, lon]
+        else:
+            # Nearest metro overall (regardless of distance) from the spatial index
+            # (equidistant metros are all returned; keep the first in file order)
+            nearest_positions, nearest_distances = metro_tree.query_nearest(
+                point, return_distance=True
+            )
+            nearest_pos = nearest_positions.min()
+            nearest_distance_miles = nearest_distances[0] / 1609.34
+            
+            # Get closest point on metro boundary for line drawing
+            from shapely.ops import nearest_points
+            point_wgs84 = Point(lon, lat)
+            _, closest_point = nearest_points(point_wgs84, metro_geoms_wgs84[nearest_pos])
+            nearest_edge_coords = [closest_point.y, closest_point.x]  # [lat, lon]
+        nearest_name = metro_names[nearest_pos]
+        nearest_cbsa = metro_cbsa[nearest_pos]
         
-        # Find metros within max distance
-        nearby_metros = metro_working[metro_working['distance'] <= max_distance_meters].copy()
+        # Find metros within max distance from the spatial index; metros
+        # containing the point are always in range
+        nearby_pos = np.union1d(
+            metro_tree.query(point, predicate='dwithin', distance=max_distance_meters),
+            containing
+        ).astype(np.intp)
         
-        if len(nearby_metros) == 0:
+        if len(nearby_pos) == 0:
             # Still return nearest metro info, but indicate it's outside range
-            return jsonify({
+            return ojsonify({
                 "within_range": False,
                 "is_inside_metro": False,
                 "nearest_metro": {
-                    "name": nearest_overall['NAME'],
-                    "cbsa_code": nearest_overall['CBSAFP'],
+                    "name": nearest_name,
+                    "cbsa_code": nearest_cbsa,
                     "distance_to_edge_miles": round(nearest_distance_miles, 2),
                     "edge_coords": nearest_edge_coords
                 },
                 "message": f"Nearest metro is {round(nearest_distance_miles, 2)} miles away (outside {max_distance_miles} mile range)"
             })
         
-        # Get the nearest metro
-        nearest = nearby_metros.loc[nearby_metros['distance'].idxmin()]
-        distance_miles = nearest['distance'] / 1609.34
-        
-        # Check if point is inside the metro area
-        is_inside = nearest.geometry.contains(point.iloc[0])
+        # The nearest metro overall is also the nearest one within range
+        is_inside = is_inside_nearest
+        nearby_distances = shapely.distance(metro_geoms[nearby_pos], point)
+        nearby_distances[np.isin(nearby_pos, containing)] = 0.0
+        nearby_miles = np.round(nearby_distances / 1609.34, 2)
         
         result = {
             "within_range": True,
             "is_inside_metro": is_inside,
             "nearest_metro": {
-                "name": nearest['NAME'],
-                "cbsa_code": nearest['CBSAFP'],
-                "distance_to_edge_miles": 0 if is_inside else round(distance_miles, 2),
+                "name": nearest_name,
+                "cbsa_code": nearest_cbsa,
+                "distance_to_edge_miles": 0 if is_inside else round(nearest_distance_miles, 2),
                 "edge_coords": nearest_edge_coords
             },
-            "all_nearby_metros": []
+            "all_nearby_metros": [
+                {
+                    "name": name,
+                    "distance_miles": distance_miles,
+                    "cbsa_code": cbsa_code
+                }
+                for name, cbsa_code, distance_miles in zip(
+                    metro_names[nearby_pos], metro_cbsa[nearby_pos], nearby_miles
+                )
+            ]
         }
         
-        # Add all nearby metros
-        for idx, row in nearby_metros.iterrows():
-            metro_info = {
-                "name": row['NAME'],
-                "distance_miles": round(row['distance'] / 1609.34, 2),
-                "cbsa_code": row['CBSAFP']
-            }
-            result["all_nearby_metros"].append(metro_info)
-        
-        return jsonify(result)
+        return ojsonify(result)
         
     except ValueError as e:
-        return jsonify({
+        return ojsonify({
             "error": "Invalid parameters. Provide lat, lon as numbers."
-        }), 400
+        }, 400)
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             "error": str(e)
-        }), 500
+        }, 500)
 
-# Load metro data when module is imported (for Gunicorn)
+# Load metro data when module is imported (for Gunicorn; with preload_app in
+# gunicorn.conf.py this runs once in the master before workers fork)
 load_metro_data()
 
 if __name__ == '__main__':
@@ -0,0 +1,11 @@
+# Gunicorn settings (picked up automatically by `gunicorn app:app`)
+import os
+
+# Import app.py (and load the metro data) once in the master before forking,
+# so workers don't each re-read the shapefile and rebuild the index
+preload_app = True
+
+# Threaded workers - request handling only reads the shared metro data.
+# Worker count comes from WEB_CONCURRENCY (gunicorn's default, 1 if unset).
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))